@@ -0,0 +1,215 @@
+import base64
+import glob
+import gzip
+import json
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from config import CAPTURE_MODE, CAPTURE_SAMPLE_RATE, CAPTURE_DIR, CAPTURE_MAX_MB
+
+# 环形缓冲分段数 (总容量 = CAPTURE_MAX_MB，平均分到各段)
+SEGMENT_COUNT = 8
+
+# fetch_page 追加的防缓存参数
+_CACHE_BUSTER_RE = re.compile(r"[?&]\s?_t=\d+$")
+
+
+class TrafficRecorder:
+    """
+    生产流量采集器
+    - record() 只在扫描线程里做采样判断和入队，压缩写盘由后台线程完成
+    - 写入 gzip 分段文件 (JSON Lines)，总大小超过上限时删除最旧的分段
+    - 队列按待写入的响应字节数限额 (一个分段的容量)，超出时直接丢弃，绝不阻塞扫描
+    """
+    def __init__(self, mode=CAPTURE_MODE, sample_rate=CAPTURE_SAMPLE_RATE,
+                 directory=CAPTURE_DIR, max_mb=CAPTURE_MAX_MB):
+        self.sample_rate = 1.0 if mode == "all" else sample_rate
+        self.directory = directory
+        self.segment_bytes = max_mb * 1024 * 1024 // SEGMENT_COUNT
+        self.queue = queue.Queue()
+        self.queue_limit = self.segment_bytes # 队列中原始响应体的字节上限 (磁盘慢时限制内存占用)
+        self.queued_bytes = 0
+        self.stats_lock = threading.Lock()
+        self.stats = {"captured": 0, "dropped": 0, "bytes": 0, "record_seconds": 0.0, "write_seconds": 0.0}
+
+        os.makedirs(directory, exist_ok=True)
+        self.segment_path = self._latest_segment() or self._new_segment_path()
+        threading.Thread(target=self._writer, daemon=True).start()
+
+    @classmethod
+    def from_config(cls):
+        """CAPTURE_MODE 为 off 时返回 None，调用方以 `if self.recorder` 判断，关闭时零开销"""
+        if CAPTURE_MODE not in ("sample", "all"): return None
+        return cls()
+
+    def record(self, url, resp, elapsed):
+        """采集一次原始响应 (url 为不含防缓存参数的原始地址)"""
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate: return
+        start = time.perf_counter()
+        entry = {
+            "ts": time.time(),
+            "url": url,
+            "status": resp.status_code,
+            "headers": dict(resp.headers),
+            "encoding": resp.encoding,
+            "elapsed": round(elapsed, 4),
+            "body": resp.content,
+        }
+        size = len(entry["body"])
+        with self.stats_lock:
+            accepted = self.queued_bytes + size <= self.queue_limit
+            if accepted:
+                self.queued_bytes += size
+            else:
+                self.stats["dropped"] += 1
+        if accepted:
+            self.queue.put_nowait(entry)
+        with self.stats_lock:
+            self.stats["record_seconds"] += time.perf_counter() - start
+
+    def summary(self):
+        """返回采集开销统计文本"""
+        with self.stats_lock:
+            s = dict(self.stats)
+        return (f"📼 采集: {s['captured']} 条 | 丢弃 {s['dropped']} | {s['bytes'] / 1024:.0f} KB | "
+                f"扫描线程开销 {s['record_seconds'] * 1000:.1f} ms | 后台写盘 {s['write_seconds'] * 1000:.1f} ms")
+
+    def _latest_segment(self):
+        segments = sorted(glob.glob(os.path.join(self.directory, "capture-*.jsonl.gz")))
+        return segments[-1] if segments else None
+
+    def _new_segment_path(self):
+        return os.path.join(self.directory, f"capture-{time.time_ns()}.jsonl.gz")
+
+    def _writer(self):
+        while True:
+            batch = [self.queue.get()]
+            # 一次性取出积压条目，合并为一个 gzip member 写入
+            while len(batch) < 100:
+                try: batch.append(self.queue.get_nowait())
+                except queue.Empty: break
+            batch_bytes = sum(len(entry["body"]) for entry in batch) # 写盘完成后才释放限额，写入中的批次同样计入
+
+            start = time.perf_counter()
+            try:
+                lines = []
+                for entry in batch:
+                    entry["body"] = base64.b64encode(entry["body"]).decode('ascii')
+                    lines.append(json.dumps(entry, ensure_ascii=False))
+                data = ("\n".join(lines) + "\n").encode('utf-8')
+                with gzip.open(self.segment_path, 'ab', compresslevel=6) as f:
+                    f.write(data)
+                if os.path.getsize(self.segment_path) >= self.segment_bytes:
+                    self._rotate()
+                with self.stats_lock:
+                    self.stats["captured"] += len(batch)
+                    self.stats["bytes"] += len(data)
+            except Exception as e:
+                print(f"⚠️ 流量采集写入失败: {e}")
+            with self.stats_lock:
+                self.stats["write_seconds"] += time.perf_counter() - start
+                self.queued_bytes -= batch_bytes
+
+    def _rotate(self):
+        self.segment_path = self._new_segment_path()
+        segments = sorted(glob.glob(os.path.join(self.directory, "capture-*.jsonl.gz")))
+        for old in segments[:-(SEGMENT_COUNT - 1)]:
+            try: os.remove(old)
+            except OSError: pass
+
+
+def load_capture(directory=CAPTURE_DIR):
+    """按时间顺序读取采集目录下的全部记录"""
+    records = []
+    for path in sorted(glob.glob(os.path.join(directory, "capture-*.jsonl.gz"))):
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip(): continue
+                    entry = json.loads(line)
+                    entry["body"] = base64.b64decode(entry["body"])
+                    records.append(entry)
+        except (OSError, EOFError) as e:
+            # 进程被杀时最后一个 member 可能不完整，保留已读出的部分
+            print(f"⚠️ 采集文件损坏 [{path}]: {e}")
+    return records
+
+
+class ReplaySession:
+    """
+    回放会话：替代 requests.Session，只返回采集到的响应，不访问网络
+    调用 serve(record) 指定下一次请求该 URL 时返回的记录
+    """
+    def __init__(self):
+        self.records = {}
+
+    def serve(self, record):
+        self.records[record["url"]] = record
+
+    def get(self, url, **kwargs):
+        record = self.records.get(_CACHE_BUSTER_RE.sub("", url))
+        if not record:
+            raise requests.ConnectionError(f"回放模式: 采集中没有该 URL [{url}]")
+        resp = requests.Response()
+        resp.status_code = record["status"]
+        resp.headers = CaseInsensitiveDict(record["headers"])
+        resp.encoding = record.get("encoding")
+        resp._content = record["body"]
+        resp.url = url
+        return resp
+
+    def post(self, url, **kwargs):
+        raise requests.ConnectionError("回放模式: 禁止访问网络")
+
+
+def replay(directory=CAPTURE_DIR, url_filter=None, repeat=1):
+    """将采集的响应逐条送回 _scan_site，统计解析耗时 (用于性能分析与解析回归二分)"""
+    from watcher import TobaccoWatcher
+
+    records = load_capture(directory)
+    if url_filter:
+        records = [r for r in records if url_filter in r["url"]]
+    if not records:
+        print(f"📭 {directory} 中没有可回放的记录")
+        return
+
+    session = ReplaySession()
+    # 回放模式：无网络、无消息、不读写状态文件、不启动任何后台组件
+    watcher = TobaccoWatcher(session=session, replay=True)
+
+    print(f"▶️ 回放 {len(records)} 条记录 x {repeat} 次")
+    timings = []
+    for _ in range(repeat):
+        for record in records:
+            session.serve(record)
+            watcher.card_fingerprints.clear() # 始终走完整解析路径，保证每次回放耗时可比
+            start = time.perf_counter()
+            has_error, restocks, _ = watcher._scan_site({"url": record["url"]})
+            elapsed = time.perf_counter() - start
+            timings.append((elapsed, record["url"], has_error))
+
+    total = sum(t[0] for t in timings)
+    errors = sum(1 for t in timings if t[2])
+    products = sum(1 for k in watcher.stock_history if not k.startswith('_'))
+    print(f"📊 回放完成: 总耗时 {total:.3f}s | 平均 {total / len(timings) * 1000:.1f} ms/页 | 错误 {errors} | 商品 {products}")
+    print("🐢 最慢的页面:")
+    for elapsed, url, _ in sorted(timings, reverse=True)[:10]:
+        print(f"  {elapsed * 1000:8.1f} ms  {url}")
+
+
+if __name__ == "__main__":
+    # 用法: python capture.py [采集目录] [URL 过滤子串] [重复次数]
+    args = sys.argv[1:]
+    replay(
+        directory=args[0] if len(args) > 0 else CAPTURE_DIR,
+        url_filter=args[1] if len(args) > 1 and args[1] else None,
+        repeat=int(args[2]) if len(args) > 2 else 1,
+    )
@@ -82,4 +82,23 @@ ADMIN_USER_ID = os.getenv("ADMIN_USER_ID")
 if not TELEGRAM_BOT_TOKEN:
     print("⚠️ 警告: 未在 .env 文件中找到 TELEGRAM_BOT_TOKEN")
 
-CHECK_INTERVAL = 60
\ No newline at end of file
+CHECK_INTERVAL = 60
+
+# ================= 流量采集配置 =================
+
+# off: 关闭 | sample: 按比例采样 | all: 全量采集
+CAPTURE_MODE = os.getenv("CAPTURE_MODE", "off").lower()
+CAPTURE_SAMPLE_RATE = float(os.getenv("CAPTURE_SAMPLE_RATE", "0.1"))
+CAPTURE_DIR = os.getenv("CAPTURE_DIR", "captures")
+CAPTURE_MAX_MB = int(os.getenv("CAPTURE_MAX_MB", "64")) # 环形缓冲总上限
+
+# ================= 解析进程池配置 =================
+
+# HTML 解析子进程数，0 表示在扫描线程内直接解析
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", "0"))
+
+# ================= 库存查询 API 配置 =================
+
+# 只读 HTTP/JSON 查询服务端口，0 表示不启动
+SNAPSHOT_API_HOST = os.getenv("SNAPSHOT_API_HOST", "127.0.0.1")
+SNAPSHOT_API_PORT = int(os.getenv("SNAPSHOT_API_PORT", "0"))
\ No newline at end of file
@@ -1,11 +1,13 @@
 import requests
 import time
 import datetime
+import queue
+import threading
 from config import TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID, ADMIN_USER_ID
 
 class TelegramNotifier:
-    def __init__(self, session=None):
-        self.token = TELEGRAM_BOT_TOKEN
+    def __init__(self, session=None, token=TELEGRAM_BOT_TOKEN):
+        self.token = token
         self.chat_id = TELEGRAM_CHAT_ID
         self.session = session or requests.Session()
         self.api_base = f"https://api.telegram.org/bot{self.token}"
@@ -102,4 +104,54 @@ class TelegramNotifier:
             except Exception as e:
                 print(f"⚠️ Telegram 监听异常: {e}")
                 time.sleep(5)
-            time.sleep(1)
\ No newline at end of file
+            time.sleep(1)
+
+
+class FanoutDispatcher:
+    """
+    订阅者推送队列
+    扫描线程只负责入队，后台线程按全局速率 (Telegram 约 30 条/秒) 批量发送，
+    订阅者再多也不会拖慢扫描循环
+    """
+    def __init__(self, notifier, workers=4, rate_per_sec=25):
+        self.notifier = notifier
+        self.queue = queue.Queue()
+        self.interval = 1.0 / rate_per_sec
+        self._rate_lock = threading.Lock()
+        self._next_slot = 0.0
+        for _ in range(workers):
+            threading.Thread(target=self._worker, daemon=True).start()
+
+    def submit(self, chat_ids, text, on_sent=None):
+        """
+        批量入队一条消息
+        :param on_sent: 发送成功后的回调，签名为 func(chat_id, message_id)
+        """
+        for chat_id in chat_ids:
+            self.queue.put(("send", chat_id, text, on_sent))
+
+    def submit_delete(self, chat_id, message_id):
+        self.queue.put(("delete", chat_id, message_id, None))
+
+    def _throttle(self):
+        with self._rate_lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now: time.sleep(slot - now)
+
+    def _worker(self):
+        while True:
+            action, chat_id, payload, on_sent = self.queue.get()
+            try:
+                self._throttle()
+                if action == "send":
+                    resp = self.notifier.send_message(payload, chat_id)
+                    if resp and on_sent:
+                        on_sent(chat_id, resp['result']['message_id'])
+                else:
+                    self.notifier.delete_message(payload, chat_id)
+            except Exception as e:
+                print(f"⚠️ 订阅推送异常: {e}")
+            finally:
+                self.queue.task_done()
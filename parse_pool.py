@@ -0,0 +1,227 @@
+import copy
+import hashlib
+import multiprocessing
+import threading
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from bs4 import BeautifulSoup
+from soupsieve import css_parser
+
+from config import SITE_CONFIGS, PARSE_WORKERS
+
+
+def check_stock_html(card_soup, selectors):
+    """[工具] 解析 HTML 单商品库存"""
+    name_elem = card_soup.select_one(selectors['product_name'])
+    button = card_soup.select_one(selectors['status_button'])
+    return _check_stock_elements(name_elem, button, selectors)
+
+
+def card_fingerprint(name_elem, button):
+    """
+    卡片指纹：名称元素 + 状态按钮的原始标记
+    库存判断只依赖这两个元素，指纹不变则结果必然不变
+    (使用 blake2b 而非 hash()，保证各解析子进程之间结果一致)
+    """
+    markup = f"{name_elem}\x00{button}".encode('utf-8')
+    return hashlib.blake2b(markup, digest_size=8).hexdigest()
+
+
+def _check_stock_elements(name_elem, button, selectors):
+    if not name_elem: return None, True
+
+    raw_name = name_elem.get_text(strip=True)
+    name = re.sub(r'<[^>]+>', '', raw_name).strip()
+
+    if not button: return None, None
+
+    # 获取按钮文本 (预处理)
+    btn_clone = copy.copy(button)
+    for hidden in btn_clone.select('.hidden'): hidden.decompose()
+    btn_text = btn_clone.get_text(strip=True).upper()
+
+    # 策略 0: 正向匹配 (优先) - 如果配置了明确的有货关键词
+    if selectors.get('in_stock_text'):
+        target_text = selectors['in_stock_text'].upper()
+        # 默认设为售罄，只有匹配到有货关键词才算有货
+        is_sold_out = True
+        if target_text in btn_text:
+            is_sold_out = False
+
+            # [新增] 二次校验：即使文字匹配，如果包含特定售罄 class 也视为无货
+            # (应对 Ribenyan 这种没货也显示"加购物车"但样式为 btn-secondary 的情况)
+            if selectors.get('sold_out_class'):
+                # class 属性通常是列表，但也可能是字符串，安全处理
+                btn_classes = button.get('class', [])
+                if isinstance(btn_classes, str): btn_classes = [btn_classes]
+
+                if selectors['sold_out_class'] in btn_classes:
+                    is_sold_out = True
+
+    # 策略 A: 特定售罄文字 (反向匹配)
+    elif selectors.get('sold_out_text'):
+        is_sold_out = False # 默认有货
+        target_text = selectors['sold_out_text'].upper()
+        if target_text in btn_text:
+            is_sold_out = True
+
+    # 策略 B: 通用属性 (反向匹配)
+    else:
+        is_sold_out = False # 默认有货
+        if button.has_attr('disabled'): is_sold_out = True
+        if not is_sold_out:
+            classes = button.get('class', [])
+            if any('sold-out' in c for c in classes): is_sold_out = True
+        if not is_sold_out:
+            default_keywords = ["售罄", "SOLD OUT", "SOLDOUT", "OUT OF STOCK"]
+            if any(kw in btn_text for kw in default_keywords):
+                is_sold_out = True
+
+    return name, is_sold_out
+
+
+def parse_products(body, encoding, selectors, known=frozenset()):
+    """
+    解析整页商品列表 (可在子进程中执行)
+    :param body: 原始响应字节
+    :param known: 上一轮该 URL 已解析过的卡片指纹，命中则跳过库存判断
+    :return: (products, skipped, card_count)
+             products 为变更卡片 [(fingerprint, name, is_sold_out)]，skipped 为未变卡片的指纹列表
+    """
+    soup = BeautifulSoup(body, 'html.parser', from_encoding=encoding)
+    cards = soup.select(selectors['product_card'])
+
+    products = []
+    skipped = []
+    for card in cards:
+        name_elem = card.select_one(selectors['product_name'])
+        button = card.select_one(selectors['status_button'])
+        fingerprint = card_fingerprint(name_elem, button)
+        if fingerprint in known:
+            skipped.append(fingerprint)
+            continue
+
+        name, is_sold_out = _check_stock_elements(name_elem, button, selectors)
+        if name is not None:
+            products.append((fingerprint, name, is_sold_out))
+    return products, skipped, len(cards)
+
+
+TEMPLATE_KEYS = ('product_card', 'product_name', 'status_button')
+
+
+def _warm_templates():
+    """
+    子进程初始化：预编译全部站点模板的 CSS 选择器 (soupsieve 内部缓存)
+    soupsieve 的缓存键包含 namespaces，Tag.select 会传入文档的 _namespaces (html.parser 下为 {})，
+    因此通过同一解析器构建的空文档编译，保证与实际解析时的缓存键一致
+    """
+    css = BeautifulSoup("", 'html.parser').css
+    for config in SITE_CONFIGS.values():
+        for key in TEMPLATE_KEYS:
+            css.compile(config['template'][key])
+    css.compile('.hidden')
+
+
+def _first_parse_cache_misses(body, encoding, selectors):
+    """在子进程中执行一次解析，返回期间 soupsieve 缓存未命中次数 (预热生效时应为 0)"""
+    before = css_parser._cached_css_compile.cache_info().misses
+    parse_products(body, encoding, selectors)
+    return css_parser._cached_css_compile.cache_info().misses - before
+
+
+class ParsePool:
+    """
+    HTML 解析进程池
+    扫描线程只负责抓取，原始字节交给子进程解析，绕开 GIL 对 BeautifulSoup 的串行化；
+    子进程只回传紧凑的 (fingerprint, name, is_sold_out) 元组。workers=0 时在当前线程内直接解析
+    """
+    def __init__(self, workers=PARSE_WORKERS):
+        self.workers = workers
+        self.executor = None
+        self.rebuild_lock = threading.Lock()
+        if workers > 0:
+            self.executor = self._new_executor()
+
+    def _new_executor(self):
+        # 主进程已有多个线程，使用 forkserver 避免 fork 继承锁状态
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("forkserver"),
+            initializer=_warm_templates,
+        )
+
+    def parse(self, body, encoding, selectors, known=frozenset()):
+        executor = self.executor
+        if not executor:
+            return parse_products(body, encoding, selectors, known)
+        try:
+            return executor.submit(parse_products, body, encoding, selectors, known).result()
+        except BrokenProcessPool:
+            # 子进程异常退出 (如 OOM) 后进程池永久不可用：重建进程池，本页回退为线程内解析
+            self._rebuild(executor)
+            return parse_products(body, encoding, selectors, known)
+
+    def _rebuild(self, broken):
+        with self.rebuild_lock:
+            # 多个扫描线程可能同时发现损坏，只重建一次
+            if self.executor is not broken: return
+            print("⚠️ 解析进程池已损坏，正在重建")
+            broken.shutdown(wait=False, cancel_futures=True)
+            self.executor = self._new_executor()
+
+    def shutdown(self):
+        if self.executor: self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _sample_page(cards=300):
+    """生成基准测试用的花沢模板页面"""
+    card = ('<div class="d-flex py-2 border-bottom"><div class="col-sm-8"><p class="mb-1">商品 {i}</p>'
+            '<p class="text-muted">描述文字 {i}</p></div><div class="col-sm-4">'
+            '<a class="btn {cls}" href="/cart/{i}">加购物车</a></div></div>')
+    html = "".join(card.format(i=i, cls="btn-secondary" if i % 3 else "btn-success") for i in range(cards))
+    return f"<html><body><div class='container'>{html}</div></body></html>".encode('utf-8')
+
+
+def benchmark(pages=200):
+    """对比不同进程数下的解析吞吐量 (页/秒)"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    body = _sample_page()
+    selectors = SITE_CONFIGS["ribenyan.com"]["template"]
+    counts = sorted({0, 1, 2, 4, os.cpu_count() or 1})
+
+    # 校验子进程预热：新进程的首次解析不应再编译任何选择器
+    pool = ParsePool(1)
+    misses = pool.executor.submit(_first_parse_cache_misses, body, 'utf-8', selectors).result()
+    pool.shutdown()
+    print(f"{'✅' if misses == 0 else '❌'} 子进程首次解析选择器缓存未命中 {misses} 次")
+
+    print(f"🧪 解析基准: {pages} 页 x {len(body) // 1024} KB, CPU 核数 {os.cpu_count()}")
+
+    for workers in counts:
+        pool = ParsePool(workers)
+        pool.parse(body, 'utf-8', selectors) # 预热
+        if pool.executor:
+            # 确保全部子进程启动完毕
+            list(pool.executor.map(parse_products, [body] * workers, ['utf-8'] * workers, [selectors] * workers))
+
+        # 模拟扫描线程池并发提交
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(workers, 1) * 2) as threads:
+            list(threads.map(lambda _: pool.parse(body, 'utf-8', selectors), range(pages)))
+        elapsed = time.perf_counter() - start
+        pool.shutdown()
+
+        label = "线程内 (无进程池)" if workers == 0 else f"{workers} 进程"
+        print(f"  {label:<16} {pages / elapsed:8.1f} 页/秒")
+
+
+if __name__ == "__main__":
+    # 用法: python parse_pool.py [页数]
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,83 @@
+import collections
+import queue
+import threading
+import time
+
+
+class RestockPipeline:
+    """
+    事件驱动的补货推送管线
+    - 每个 URL 扫描完成即 publish 一个事件，不再等待同域名的其他页面
+    - 报警线程：按到达顺序推送补货，并记录 "发现 -> 推送完成" 延迟
+    - 看板线程：收到变更后防抖合并，短时间内的多次变更只刷新一次
+    """
+    def __init__(self, on_restocks, on_changed, debounce=3.0):
+        """
+        :param on_restocks: 推送补货的函数，签名为 func(records)
+        :param on_changed: 刷新看板的函数，无参数
+        :param debounce: 看板刷新防抖时间 (秒)
+        """
+        self.on_restocks = on_restocks
+        self.on_changed = on_changed
+        self.debounce = debounce
+
+        self.alert_queue = queue.Queue()
+        self.dashboard_dirty = threading.Event()
+        self.refresh_lock = threading.Lock() # 串行化看板刷新，drain() 借此等待进行中的刷新
+        self.latency_lock = threading.Lock()
+        self.latencies = collections.deque(maxlen=200) # 最近的推送延迟 (秒)
+
+        threading.Thread(target=self._alert_worker, name="alert-dispatcher", daemon=True).start()
+        threading.Thread(target=self._dashboard_worker, name="dashboard-updater", daemon=True).start()
+
+    def publish(self, url, restocks, changed):
+        """发布单个 URL 的扫描结果 (由扫描线程调用，立即返回)"""
+        if restocks:
+            self.alert_queue.put((time.monotonic(), url, restocks))
+        if changed:
+            self.dashboard_dirty.set()
+
+    def drain(self):
+        """等待已发布的补货全部推送完成、进行中的看板刷新结束，并立即执行挂起的刷新 (每轮结束时调用)"""
+        self.alert_queue.join()
+        with self.refresh_lock:
+            if self.dashboard_dirty.is_set():
+                self.dashboard_dirty.clear()
+                self._safe_call(self.on_changed)
+
+    def latency_summary(self):
+        """返回推送延迟统计文本，无数据时返回 None"""
+        with self.latency_lock:
+            samples = sorted(self.latencies)
+        if not samples: return None
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        avg = sum(samples) / len(samples)
+        return f"⚡ 推送延迟 (最近 {len(samples)} 次): 平均 {avg:.2f}s | P95 {p95:.2f}s | 最大 {samples[-1]:.2f}s"
+
+    def _alert_worker(self):
+        while True:
+            detected_at, url, restocks = self.alert_queue.get()
+            try:
+                print(f"⚡ [即时推送] {url} 发现 {len(restocks)} 个补货")
+                self._safe_call(self.on_restocks, restocks)
+                latency = time.monotonic() - detected_at
+                with self.latency_lock:
+                    self.latencies.append(latency)
+            finally:
+                self.alert_queue.task_done()
+
+    def _dashboard_worker(self):
+        while True:
+            self.dashboard_dirty.wait()
+            time.sleep(self.debounce)
+            with self.refresh_lock:
+                # 防抖期间可能已被 drain() 处理
+                if not self.dashboard_dirty.is_set(): continue
+                self.dashboard_dirty.clear()
+                self._safe_call(self.on_changed)
+
+    def _safe_call(self, func, *args):
+        try:
+            func(*args)
+        except Exception as e:
+            print(f"⚠️ 推送管线异常: {e}")
@@ -0,0 +1,161 @@
+import datetime
+import html
+import linecache
+import os
+import sys
+import threading
+import time
+
+# 常量定义
+PROFILE_DIR = "profiles"
+MAX_PROFILE_SECONDS = 300
+
+# 线程/队列框架帧: 作为叶子帧时是空闲等待，在累计排行中也没有意义
+FRAMEWORK_FILES = ("(threading.py)", "(thread.py)", "(queue.py)", "(selectors.py)")
+# 叶子帧命中这些标签视为网络等待，不计入热点
+IDLE_MARKERS = ("select", "recv_into", "readinto")
+# 栈中含有这些帧的空闲样本是在等待解析子进程 (Future.result)，计为 <parse pool wait> 而非空闲
+POOL_WAIT_FRAMES = ("parse (parse_pool.py)",)
+
+
+class SamplingProfiler:
+    """
+    采样式性能分析器
+    - 后台线程按固定间隔读取 sys._current_frames()，统计各线程调用栈
+    - 只在 run() 期间存在采样线程，未分析时零开销
+    - 输出 Top 热点函数文本摘要 + flamegraph.pl / speedscope 可读的 collapsed stack 文件
+    """
+    _running_lock = threading.Lock() # 同一时间只允许一个分析任务
+
+    def __init__(self, interval=0.02):
+        self.interval = interval
+        self.raw_stacks = {}  # (线程名, (code, ...), 是否锁等待) -> 采样次数，采样时只做计数
+        self.labels = {}      # code -> "函数 (文件)"，每个 code 对象只格式化一次
+        self.leaf_kinds = {}  # (code, 行号) -> (是否锁等待, 是否空闲)，每个位置只查一次源码
+        self.last_seen = {}   # 线程 ID -> (叶子帧, f_lasti, key)，阻塞线程栈不变时直接复用
+        self.stacks = {}      # "线程;帧1;帧2" -> 采样次数 (含空闲，保证火焰图完整)
+        self.self_counts = {} # 非空闲样本: 叶子帧 -> 采样次数
+        self.total_counts = {} # 非空闲样本: 出现在栈中的帧 -> 采样次数 (每个样本只计一次)
+        self.busy_samples = 0
+        self.pool_wait_samples = 0
+        self.samples = 0
+
+    @classmethod
+    def reserve(cls):
+        """
+        预占分析任务 (非阻塞)，成功返回 True
+        调用方在启动采样线程前预占，再以 run(..., reserved=True) 将所有权交给采样线程，避免并发指令都通过检查
+        """
+        return cls._running_lock.acquire(blocking=False)
+
+    def run(self, seconds, reserved=False):
+        """阻塞采样 seconds 秒，返回 (文本摘要, 输出文件路径)；已有任务运行时返回 (None, None)"""
+        if not reserved and not self.reserve():
+            return None, None
+        try:
+            self._collect(seconds)
+            path = self._write_collapsed()
+            return self._summary(seconds), path
+        finally:
+            self._running_lock.release()
+
+    def _collect(self, seconds):
+        own_id = threading.get_ident()
+        deadline = time.monotonic() + seconds
+        names = {}
+        while time.monotonic() < deadline:
+            frames = sys._current_frames()
+            # 仅在出现新线程时刷新线程名
+            if not names.keys() >= frames.keys():
+                names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in frames.items():
+                if thread_id == own_id: continue
+                self._add_sample(thread_id, names.get(thread_id, str(thread_id)), frame)
+            self.samples += 1
+            time.sleep(self.interval)
+        self.last_seen.clear() # 释放对帧对象的引用
+        self._aggregate()
+
+    def _add_sample(self, thread_id, thread_name, frame):
+        """采样热路径：只收集 code 对象元组并计数，格式化与统计留到采样结束后"""
+        # 叶子帧对象与执行位置都未变时，调用栈必然相同 (空闲/阻塞线程的常见情况)
+        last = self.last_seen.get(thread_id)
+        if last and last[0] is frame and last[1] == frame.f_lasti:
+            self.raw_stacks[last[2]] += 1
+            return
+
+        leaf = frame
+        leaf_key = (frame.f_code, frame.f_lineno)
+        codes = []
+        while frame is not None:
+            codes.append(frame.f_code)
+            frame = frame.f_back
+
+        kind = self.leaf_kinds.get(leaf_key)
+        if kind is None:
+            kind = self.leaf_kinds[leaf_key] = self._classify_leaf(*leaf_key)
+        key = (thread_name, tuple(codes), kind)
+        self.raw_stacks[key] = self.raw_stacks.get(key, 0) + 1
+        self.last_seen[thread_id] = (leaf, leaf.f_lasti, key)
+
+    def _label(self, code):
+        label = self.labels.get(code)
+        if label is None:
+            label = self.labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)})"
+        return label
+
+    def _classify_leaf(self, code, lineno):
+        """返回 (是否锁等待, 是否空闲)"""
+        label = self._label(code)
+        line = linecache.getline(code.co_filename, lineno or 0)
+        framework = label.endswith(FRAMEWORK_FILES)
+        # 阻塞在业务锁上的线程在 Python 层表现为停在 with/acquire 行，单独标记便于识别锁等待
+        lock_wait = not framework and "lock" in line and ("with " in line or "acquire(" in line)
+        # time.sleep 是 C 函数，叶子帧停在调用行上，需按源码行识别
+        idle = not lock_wait and (framework or "sleep(" in line or any(m in label for m in IDLE_MARKERS))
+        return lock_wait, idle
+
+    def _aggregate(self):
+        for (thread_name, codes, (lock_wait, idle)), count in self.raw_stacks.items():
+            labels = [self._label(code) for code in reversed(codes)]
+            if lock_wait: labels.append("<lock wait>")
+            # 子进程不在采样范围内，扫描线程等待解析结果的时间代表解析耗时，不能当作空闲丢弃
+            if idle and any(label in POOL_WAIT_FRAMES for label in labels):
+                labels.append("<parse pool wait>")
+                idle = False
+                self.pool_wait_samples += count
+
+            stack = ";".join([thread_name] + labels)
+            self.stacks[stack] = self.stacks.get(stack, 0) + count
+
+            if idle: continue
+            self.busy_samples += count
+            self.self_counts[labels[-1]] = self.self_counts.get(labels[-1], 0) + count
+            for label in set(labels):
+                if label.endswith(FRAMEWORK_FILES): continue
+                self.total_counts[label] = self.total_counts.get(label, 0) + count
+
+    def _write_collapsed(self):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        name = f"profile-{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}.folded"
+        path = os.path.join(PROFILE_DIR, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write(f"{stack} {count}\n")
+        return path
+
+    def _summary(self, seconds, top=10):
+        total = self.busy_samples or 1
+
+        def fmt(counts):
+            rows = sorted(counts.items(), key=lambda x: x[1], reverse=True)[:top]
+            return "\n".join(f"{c * 100 / total:5.1f}% {html.escape(label)}" for label, c in rows) or "(无)"
+
+        note = ""
+        if self.pool_wait_samples:
+            note = "\nℹ️ 解析子进程不在采样范围内，&lt;parse pool wait&gt; 为扫描线程等待子进程解析的时间"
+        return (
+            f"🔬 <b>性能分析</b> ({seconds}s, {self.samples} 次采样, {self.busy_samples} 个忙碌线程样本)\n"
+            f"🔥 <b>自身耗时 Top {top}</b>\n<pre>{fmt(self.self_counts)}</pre>\n"
+            f"📚 <b>累计耗时 Top {top}</b>\n<pre>{fmt(self.total_counts)}</pre>{note}"
+        )
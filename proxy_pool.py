@@ -0,0 +1,303 @@
+import json
+import os
+import random
+import threading
+import time
+
+# 常量定义
+PROXIES_FILE = "proxies.json"
+DEFAULT_PROBE_URL = "https://www.gstatic.com/generate_204"
+
+EWMA_ALPHA = 0.3          # 延迟/错误率滑动平均系数
+EJECT_AFTER_FAILURES = 3  # 连续失败次数达到即剔除
+BLOCK_STATUS = (403, 429) # 视为被目标站封禁的状态码
+BASE_COOLDOWN = 60        # 首次剔除冷却 (秒)，之后指数退避
+MAX_COOLDOWN = 1800
+PROBE_INTERVAL = 30
+
+
+class DomainHealth:
+    """代理在单个域名上的健康状态 (同一 IP 可能只被某一家店封禁)"""
+    def __init__(self):
+        self.latency = 1.0      # 延迟 EWMA (秒)
+        self.error_rate = 0.0   # 错误率 EWMA (0~1)
+        self.blocks = 0
+        self.failures = 0       # 连续失败次数
+        self.ejections = 0
+        self.ejected_until = 0.0
+        self.probe_url = None   # 剔除时的请求地址，恢复探测直接访问该站点
+        self.probe_headers = None # 剔除时的请求头 (UA/Referer 等)，探测原样带上，避免因 python-requests UA 被拒
+
+    @property
+    def healthy(self):
+        return self.ejected_until == 0.0
+
+    @property
+    def score(self):
+        """分数越高越优先：低延迟、低错误率、少封禁"""
+        return 1.0 / (self.latency * (1 + 4 * self.error_rate) * (1 + 0.5 * self.blocks))
+
+
+class ProxyState:
+    """单个出口代理 (每个代理独立 Session，Cookie 与连接池随 IP 隔离)"""
+    def __init__(self, url, domains, session):
+        self.url = url
+        self.domains = domains
+        self.session = session
+        self.session.proxies = {"http": url, "https": url}
+        self.health = {} # domain -> DomainHealth
+
+    def serves(self, domain):
+        return not self.domains or any(d in domain for d in self.domains)
+
+    def health_for(self, domain):
+        health = self.health.get(domain)
+        if health is None:
+            health = self.health[domain] = DomainHealth()
+        return health
+
+
+class ProxyPool:
+    """
+    出口代理池
+    - 按域名分配代理，按 (代理, 域名) 的分数加权随机选择，分散各 IP 的请求频率
+    - sticky_domains 中的域名固定使用同一代理 (Cookie 依赖 IP 的站点)，直到该代理在此域名上被剔除
+    - 连续失败或被 403/429 封禁时只在该域名上剔除，冷却后由后台线程用该站点地址探测恢复
+    - 某域名无可用代理时回退为直连
+    """
+    def __init__(self, proxies, session_factory, sticky_domains=(), probe_url=DEFAULT_PROBE_URL):
+        self.lock = threading.Lock()
+        self.proxies = [ProxyState(p['url'], p.get('domains', []), session_factory()) for p in proxies]
+        self.sticky_domains = list(sticky_domains)
+        self.sticky = {} # domain -> ProxyState
+        self.probe_url = probe_url
+        self.total_blocks = 0
+        threading.Thread(target=self._probe_loop, name="proxy-prober", daemon=True).start()
+
+    @classmethod
+    def from_file(cls, session_factory, path=PROXIES_FILE):
+        """
+        读取 proxies.json，未配置代理时返回 None (直连，行为与之前一致)
+        格式: {"proxies": [{"url": "http://1.2.3.4:8080", "domains": ["ribenyan.com"]}],
+               "sticky_domains": ["tobaccolifestyle.com"], "probe_url": "..."}
+        domains 为空表示服务全部域名；probe_url 仅在没有可用站点地址时用于探测
+        """
+        if not os.path.exists(path): return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"⚠️ 代理配置读取失败: {e}")
+            return None
+        if not data.get('proxies'): return None
+        print(f"🌐 已加载 {len(data['proxies'])} 个出口代理")
+        return cls(data['proxies'], session_factory,
+                   data.get('sticky_domains', []), data.get('probe_url', DEFAULT_PROBE_URL))
+
+    def acquire(self, domain):
+        """为域名选择代理，无可用代理时返回 None (调用方直连)"""
+        with self.lock:
+            sticky = any(d in domain for d in self.sticky_domains)
+            if sticky:
+                pinned = self.sticky.get(domain)
+                if pinned and pinned.health_for(domain).healthy: return pinned
+
+            candidates = [p for p in self.proxies if p.serves(domain) and p.health_for(domain).healthy]
+            if not candidates: return None
+            proxy = random.choices(candidates, weights=[p.health_for(domain).score for p in candidates])[0]
+            if sticky: self.sticky[domain] = proxy
+            return proxy
+
+    def report(self, proxy, domain, url, elapsed, status=None, error=None, headers=None):
+        """回报一次请求结果 (status 为 HTTP 状态码；error 为网络异常；headers 为该请求的请求头，供恢复探测复用)"""
+        blocked = status in BLOCK_STATUS
+        failed = error is not None or blocked or (status is not None and status >= 500)
+        with self.lock:
+            health = proxy.health_for(domain)
+            health.error_rate = (1 - EWMA_ALPHA) * health.error_rate + EWMA_ALPHA * (1.0 if failed else 0.0)
+            if error is None:
+                health.latency = (1 - EWMA_ALPHA) * health.latency + EWMA_ALPHA * elapsed
+            if blocked:
+                health.blocks += 1
+                self.total_blocks += 1
+            health.failures = health.failures + 1 if failed else 0
+
+            if health.healthy and (blocked or health.failures >= EJECT_AFTER_FAILURES):
+                health.probe_url = url
+                health.probe_headers = dict(headers) if headers else None
+                self._eject(proxy, domain, type(error).__name__ if error else f"HTTP {status}")
+
+    def summary(self):
+        with self.lock:
+            ejected = sum(1 for p in self.proxies for h in p.health.values() if not h.healthy)
+        return f"🌐 代理池: {len(self.proxies)} 个代理 | 剔除中 (代理, 域名) {ejected} 组 | 累计封禁 {self.total_blocks} 次"
+
+    def _eject(self, proxy, domain, reason):
+        health = proxy.health_for(domain)
+        cooldown = min(BASE_COOLDOWN * 2 ** health.ejections, MAX_COOLDOWN)
+        health.ejections += 1
+        health.ejected_until = time.monotonic() + cooldown
+        if self.sticky.get(domain) is proxy:
+            del self.sticky[domain]
+        print(f"🚫 [代理] {proxy.url} 在 {domain} 上被剔除 ({reason})，{cooldown}s 后重新探测")
+
+    def _probe_loop(self):
+        while True:
+            time.sleep(PROBE_INTERVAL)
+            self.probe_due()
+
+    def probe_due(self):
+        """探测所有冷却到期的 (代理, 域名)"""
+        now = time.monotonic()
+        with self.lock:
+            due = [(p, d) for p in self.proxies for d, h in p.health.items()
+                   if not h.healthy and h.ejected_until <= now]
+        for proxy, domain in due:
+            self._probe(proxy, domain)
+
+    def _probe(self, proxy, domain):
+        # 直接访问当初被封禁/失败的站点地址，确认该站点已不再拦截此 IP
+        health = proxy.health_for(domain)
+        url, headers = (health.probe_url, health.probe_headers) if health.probe_url else (self.probe_url, None)
+        start = time.perf_counter()
+        try:
+            resp = proxy.session.get(url, headers=headers, timeout=10)
+            ok = resp.status_code < 400
+        except Exception:
+            ok = False
+        with self.lock:
+            health = proxy.health_for(domain)
+            if ok:
+                health.ejected_until = 0.0
+                health.failures = 0
+                health.blocks = 0
+                health.error_rate = 0.5 # 以中等分数恢复，逐步重新获得流量
+                health.latency = time.perf_counter() - start
+                print(f"✅ [代理] {proxy.url} 在 {domain} 上探测恢复")
+            else:
+                self._eject(proxy, domain, "探测失败")
+
+
+def _selftest():
+    """
+    本地替身代理自测 (不访问外网)
+    两个本地源站模拟两家店；代理 A 正常转发，代理 B 只封禁源站 1，代理 C 端口不可达
+    源站 1 校验请求头 (拒绝 python-requests UA)，确认恢复探测带上了真实请求的请求头
+    """
+    import requests
+    import urllib.error
+    import urllib.request
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import urlparse
+
+    def start(handler):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server.server_address[1]
+
+    class Origin(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200); self.send_header("Content-Length", "2"); self.end_headers()
+            self.wfile.write(b"ok")
+        def log_message(self, *args): pass
+
+    class HeaderCheckingOrigin(Origin):
+        # 模拟 Cloudflare/Shopify：默认 UA 一律 403
+        def do_GET(self):
+            if self.headers.get("User-Agent", "").startswith("python-requests"):
+                self.send_response(403); self.send_header("Content-Length", "0"); self.end_headers()
+                return
+            super().do_GET()
+
+    blocked_origin = {}
+
+    class Proxy(BaseHTTPRequestHandler):
+        blocking = False
+        def do_GET(self):
+            if self.blocking and urlparse(self.path).netloc == blocked_origin["netloc"]:
+                self.send_response(429); self.send_header("Content-Length", "0"); self.end_headers()
+                return
+            forwarded = {k: v for k, v in self.headers.items() if k.lower() in ("user-agent", "referer", "accept")}
+            try:
+                with urllib.request.urlopen(urllib.request.Request(self.path, headers=forwarded)) as r:
+                    status, body = r.status, r.read()
+            except urllib.error.HTTPError as e:
+                status, body = e.code, b""
+            self.send_response(status); self.send_header("Content-Length", str(len(body))); self.end_headers()
+            self.wfile.write(body)
+        def log_message(self, *args): pass
+
+    origin1 = f"http://127.0.0.1:{start(HeaderCheckingOrigin)}/page"
+    origin2 = f"http://127.0.0.1:{start(Origin)}/page"
+    blocked_origin["netloc"] = urlparse(origin1).netloc
+    good = f"http://127.0.0.1:{start(Proxy)}"
+    blocking_proxy = type('BlockingProxy', (Proxy,), {'blocking': True})
+    blocker = f"http://127.0.0.1:{start(blocking_proxy)}"
+    dead = "http://127.0.0.1:9" # discard 端口，通常无人监听
+
+    def session_factory():
+        s = requests.Session()
+        s.trust_env = False
+        return s
+
+    pool = ProxyPool([{"url": good}, {"url": blocker}, {"url": dead}], session_factory)
+
+    browser_headers = {"User-Agent": "Mozilla/5.0 (selftest)", "Accept": "text/html"}
+
+    def fetch(url, proxy=None):
+        domain = urlparse(url).netloc
+        proxy = proxy or pool.acquire(domain)
+        if not proxy: return
+        start_time = time.perf_counter()
+        try:
+            resp = proxy.session.get(url, headers=browser_headers, timeout=5)
+        except Exception as e:
+            pool.report(proxy, domain, url, time.perf_counter() - start_time, error=e, headers=browser_headers)
+            return
+        pool.report(proxy, domain, url, time.perf_counter() - start_time, status=resp.status_code,
+                    headers=browser_headers)
+
+    # 逐个代理定向请求 (不依赖加权随机)，保证每个 (代理, 源站) 都有足够样本
+    for proxy in pool.proxies:
+        for _ in range(EJECT_AFTER_FAILURES):
+            fetch(origin1, proxy)
+            fetch(origin2, proxy)
+
+    def healthy(proxy_url, origin):
+        proxy = next(p for p in pool.proxies if p.url == proxy_url)
+        return proxy.health_for(urlparse(origin).netloc).healthy
+
+    checks = [
+        ("封禁代理在源站 1 上被剔除", not healthy(blocker, origin1)),
+        ("封禁代理在源站 2 上仍可用", healthy(blocker, origin2)),
+        ("不可达代理在两个源站上均被剔除", not healthy(dead, origin1) and not healthy(dead, origin2)),
+        ("正常代理始终可用", healthy(good, origin1) and healthy(good, origin2)),
+        ("源站 1 只会选到正常代理", all(pool.acquire(urlparse(origin1).netloc).url == good for _ in range(20))),
+    ]
+
+    def expire_cooldowns():
+        for p in pool.proxies:
+            for h in p.health.values():
+                if not h.healthy: h.ejected_until = time.monotonic()
+
+    # 冷却到期后用源站 1 地址探测：仍被封禁，应继续剔除
+    expire_cooldowns()
+    pool.probe_due()
+    checks.append(("探测源站 1 仍被封禁，保持剔除", not healthy(blocker, origin1)))
+
+    # 源站 1 解除封禁后再次探测：应恢复
+    blocking_proxy.blocking = False
+    expire_cooldowns()
+    pool.probe_due()
+    checks.append(("源站 1 解封后探测恢复 (探测带上了浏览器 UA)", healthy(blocker, origin1)))
+
+    failed = [name for name, ok in checks if not ok]
+    for name, ok in checks:
+        print(f"{'✅' if ok else '❌'} {name}")
+    print(pool.summary())
+    return not failed
+
+
+if __name__ == "__main__":
+    # 用法: python proxy_pool.py  (本地替身代理自测)
+    raise SystemExit(0 if _selftest() else 1)
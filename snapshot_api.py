@@ -0,0 +1,175 @@
+import collections
+import datetime
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from config import SNAPSHOT_API_HOST, SNAPSHOT_API_PORT
+
+# 常量定义
+CHANGELOG_SIZE = 500 # 保留最近多少个版本的增量
+SNAPSHOT_FIELDS = ('name', 'url', 'site_name', 'is_sold_out')
+STATUS_FILTERS = (None, 'in_stock', 'sold_out')
+
+
+class Snapshot:
+    """不可变库存快照：发布后不再修改，响应体按查询条件惰性序列化并缓存"""
+    def __init__(self, version, products):
+        self.version = version
+        self.products = products # pid -> {id, name, url, site_name, is_sold_out}
+        self.generated_at = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.etag = f'"v{version}"'
+        self.sites = {p['site_name'] for p in products.values()}
+        self._cache = {} # 仅缓存已知站点 x 合法状态，条目数有上限
+        self._cache_lock = threading.Lock()
+
+    def render(self, site=None, status=None):
+        """status 须为 STATUS_FILTERS 之一 (由调用方校验)；未知站点不缓存，避免任意参数撑大内存"""
+        key = (site, status)
+        cacheable = site is None or site in self.sites
+        body = self._cache.get(key)
+        if body is not None: return body
+
+        items = self.products.values()
+        if site: items = [p for p in items if p['site_name'] == site]
+        if status == 'in_stock': items = [p for p in items if not p['is_sold_out']]
+        elif status == 'sold_out': items = [p for p in items if p['is_sold_out']]
+        payload = {"version": self.version, "generated_at": self.generated_at, "products": list(items)}
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        if cacheable:
+            with self._cache_lock:
+                self._cache[key] = body
+        return body
+
+
+class SnapshotStore:
+    """
+    库存快照发布器
+    - 每次持久化后 publish()，仅在库存内容实际变化时生成新版本
+    - 读者只读取 self.current 引用，不需要 watcher 的锁
+    - 记录最近 CHANGELOG_SIZE 个版本的增量，支持 "自版本 N 以来的变化" 查询
+    """
+    def __init__(self):
+        self.publish_lock = threading.Lock()
+        # 版本号以启动时间为起点，重启后旧客户端的 since 必然落在保留范围外，触发全量同步
+        self.current = Snapshot(int(time.time()), {})
+        self.changelog = collections.deque(maxlen=CHANGELOG_SIZE) # (version, changed_ids, removed_ids)
+
+    @classmethod
+    def from_config(cls):
+        """未配置 SNAPSHOT_API_PORT 或端口绑定失败时返回 None (不启动查询服务，不影响监控)"""
+        if not SNAPSHOT_API_PORT: return None
+        store = cls()
+        try:
+            store.serve(SNAPSHOT_API_HOST, SNAPSHOT_API_PORT)
+        except OSError as e:
+            print(f"⚠️ 库存查询 API 启动失败 [{SNAPSHOT_API_HOST}:{SNAPSHOT_API_PORT}]: {e}")
+            return None
+        return store
+
+    def publish(self, records):
+        """
+        发布新快照
+        :param records: {pid: record}，记录本身在 watcher 中只替换不修改，可安全引用
+        """
+        with self.publish_lock:
+            previous = self.current.products
+            products = {}
+            changed = []
+            for pid, record in records.items():
+                old = previous.get(pid)
+                if old and all(old[f] == record.get(f) for f in SNAPSHOT_FIELDS):
+                    products[pid] = old
+                    continue
+                products[pid] = {"id": pid, **{f: record.get(f) for f in SNAPSHOT_FIELDS}}
+                changed.append(pid)
+            removed = [pid for pid in previous if pid not in products]
+
+            if not changed and not removed: return
+            version = self.current.version + 1
+            self.changelog.append((version, changed, removed))
+            self.current = Snapshot(version, products)
+
+    def changes_since(self, since):
+        """
+        返回 (snapshot, changed_products, removed_ids)
+        since 超出保留范围 (过旧或来自重启前) 时后两项为 None，客户端需通过 /stock 全量同步
+        """
+        snapshot = self.current
+        entries = [e for e in list(self.changelog) if e[0] <= snapshot.version]
+        if since == snapshot.version: return snapshot, [], []
+        if since > snapshot.version: return snapshot, None, None
+        if not entries or since < entries[0][0] - 1: return snapshot, None, None
+
+        changed, removed = set(), set()
+        for version, c, r in entries:
+            if version <= since: continue
+            changed.update(c); changed.difference_update(r)
+            removed.update(r); removed.difference_update(c)
+        products = [snapshot.products[pid] for pid in changed if pid in snapshot.products]
+        return snapshot, products, sorted(removed)
+
+    def serve(self, host, port):
+        handler = type("SnapshotHandler", (_SnapshotHandler,), {"store": self})
+        server = ThreadingHTTPServer((host, port), handler)
+        threading.Thread(target=server.serve_forever, name="snapshot-api", daemon=True).start()
+        print(f"📡 库存查询 API: http://{host}:{port}/stock")
+
+
+class _SnapshotHandler(BaseHTTPRequestHandler):
+    """
+    GET /stock[?site=&status=in_stock|sold_out]  当前快照 (支持 ETag / If-None-Match)
+    GET /changes?since=N                          自版本 N 以来的增量，过旧返回 410
+    """
+    store = None
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        qs = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        if parsed.path == "/stock":
+            self._stock(qs)
+        elif parsed.path == "/changes":
+            self._changes(qs)
+        else:
+            self._send(404, b'{"error": "not found"}')
+
+    def _stock(self, qs):
+        status = qs.get("status")
+        if status not in STATUS_FILTERS:
+            self._send(400, b'{"error": "status must be in_stock or sold_out"}')
+            return
+
+        snapshot = self.store.current
+        if self.headers.get("If-None-Match") == snapshot.etag:
+            self._send(304, None, snapshot.etag)
+            return
+        self._send(200, snapshot.render(qs.get("site"), status), snapshot.etag)
+
+    def _changes(self, qs):
+        try:
+            since = int(qs.get("since", "0"))
+        except ValueError:
+            self._send(400, b'{"error": "since must be an integer"}')
+            return
+
+        snapshot, products, removed = self.store.changes_since(since)
+        if products is None:
+            body = {"error": "unknown or expired version, resync via /stock", "version": snapshot.version}
+            self._send(410, json.dumps(body).encode('utf-8'))
+            return
+        body = {"version": snapshot.version, "since": since, "changed": products, "removed": removed}
+        self._send(200, json.dumps(body, ensure_ascii=False).encode('utf-8'), snapshot.etag)
+
+    def _send(self, code, body, etag=None):
+        self.send_response(code)
+        if etag: self.send_header("ETag", etag)
+        if body is not None:
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body is not None: self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # 静默访问日志，避免刷屏
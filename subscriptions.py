@@ -0,0 +1,162 @@
+import json
+import os
+import re
+import threading
+
+from config import SITE_CONFIGS
+
+# 常量定义
+SUBSCRIPTIONS_FILE = "subscriptions.json"
+
+# 拉丁词 / 数字 与 中日文字符分段匹配
+_TOKEN_RE = re.compile(r"[a-z0-9]+|[\u3040-\u30ff\u3400-\u9fff]+")
+
+
+def tokenize(text, unigrams=False):
+    """
+    将文本切分为检索 token
+    - 拉丁字母/数字: 按单词切分 (小写)
+    - 中日文: 按相邻二字切分 (单字则保留单字)，无需分词词典
+    :param unigrams: 额外输出中日文单字 (用于商品名，使单字订阅词也能命中)
+    """
+    tokens = []
+    for run in _TOKEN_RE.findall((text or "").lower()):
+        if run[0].isascii():
+            tokens.append(run)
+        elif len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+            if unigrams: tokens.extend(run)
+    return tokens
+
+
+def _resolve_site(query):
+    """若订阅词是站点名或域名，返回站点显示名称，否则返回 None"""
+    q = query.strip().lower()
+    for domain, config in SITE_CONFIGS.items():
+        if q == domain or q == config["name"].lower():
+            return config["name"]
+    return None
+
+
+class SubscriptionStore:
+    """
+    订阅存储 + 倒排索引
+    - 站点订阅: site_name -> {chat_id}
+    - 关键词订阅: 首 token -> {(chat_id, keyword): 全部 token}
+    匹配时只查询商品名自身 token 对应的桶，耗时与命中数成正比，而非遍历全部订阅
+    """
+
+    def __init__(self, path=SUBSCRIPTIONS_FILE):
+        self.path = path
+        self.lock = threading.RLock()
+        self.subscriptions = self._load()  # {chat_id(str): [{"kind": "site"/"keyword", "value": str}]}
+        self.site_index = {}
+        self.token_index = {}
+        self._rebuild_index()
+
+    def _load(self):
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except: pass
+        return {}
+
+    def save(self):
+        with self.lock:
+            try:
+                with open(self.path, 'w', encoding='utf-8') as f:
+                    json.dump(self.subscriptions, f, ensure_ascii=False, indent=2)
+            except Exception as e:
+                print(f"保存订阅失败: {e}")
+
+    def _rebuild_index(self):
+        with self.lock:
+            self.site_index = {}
+            self.token_index = {}
+            for chat_id, subs in self.subscriptions.items():
+                for sub in subs:
+                    self._index_add(chat_id, sub)
+
+    def _index_add(self, chat_id, sub):
+        if sub["kind"] == "site":
+            self.site_index.setdefault(sub["value"], set()).add(chat_id)
+        else:
+            tokens = tokenize(sub["value"])
+            if not tokens: return
+            bucket = self.token_index.setdefault(tokens[0], {})
+            bucket[(chat_id, sub["value"])] = frozenset(tokens)
+
+    def _index_remove(self, chat_id, sub):
+        if sub["kind"] == "site":
+            subscribers = self.site_index.get(sub["value"])
+            if subscribers:
+                subscribers.discard(chat_id)
+                if not subscribers: del self.site_index[sub["value"]]
+        else:
+            tokens = tokenize(sub["value"])
+            if not tokens: return
+            bucket = self.token_index.get(tokens[0])
+            if bucket:
+                bucket.pop((chat_id, sub["value"]), None)
+                if not bucket: del self.token_index[tokens[0]]
+
+    def _parse_query(self, query):
+        query = query.strip()
+        site = _resolve_site(query)
+        if site:
+            return {"kind": "site", "value": site}
+        if not tokenize(query):
+            return None
+        return {"kind": "keyword", "value": query.lower()}
+
+    def add(self, chat_id, query):
+        """添加订阅，返回订阅项；无效或已存在返回 None"""
+        sub = self._parse_query(query)
+        if not sub: return None
+        chat_id = str(chat_id)
+        with self.lock:
+            subs = self.subscriptions.setdefault(chat_id, [])
+            if sub in subs: return None
+            subs.append(sub)
+            self._index_add(chat_id, sub)
+            self.save()
+        return sub
+
+    def remove(self, chat_id, query=None):
+        """移除订阅 (query 为空则清空该用户全部订阅)，返回移除数量"""
+        chat_id = str(chat_id)
+        with self.lock:
+            subs = self.subscriptions.get(chat_id, [])
+            if query:
+                sub = self._parse_query(query)
+                targets = [sub] if sub in subs else []
+            else:
+                targets = list(subs)
+            for sub in targets:
+                subs.remove(sub)
+                self._index_remove(chat_id, sub)
+            if not subs:
+                self.subscriptions.pop(chat_id, None)
+            if targets: self.save()
+            return len(targets)
+
+    def list(self, chat_id):
+        with self.lock:
+            return list(self.subscriptions.get(str(chat_id), []))
+
+    def match(self, record):
+        """返回应收到该补货记录的订阅者 chat_id 集合"""
+        recipients = set()
+        name_tokens = set(tokenize(record.get('name', ''), unigrams=True))
+        with self.lock:
+            recipients.update(self.site_index.get(record.get('site_name'), ()))
+            for token in name_tokens:
+                bucket = self.token_index.get(token)
+                if not bucket: continue
+                for (chat_id, _), tokens in bucket.items():
+                    if chat_id not in recipients and tokens <= name_tokens:
+                        recipients.add(chat_id)
+        return recipients
@@ -1,6 +1,6 @@
 import requests
-import re
 import json
+import html
 import os
 import time
 import random
@@ -10,39 +10,75 @@ from concurrent.futures import ThreadPoolExecutor, as_completed, wait
 from urllib.parse import urlparse, parse_qs
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
-from bs4 import BeautifulSoup
 from fake_useragent import UserAgent
 from Crypto.Cipher import AES
 from Crypto.Util.Padding import unpad
 import base64
 
 # 本地模块
-from config import get_site_config, ADMIN_USER_ID, TELEGRAM_CHAT_ID
-from notifier import TelegramNotifier
+from config import get_site_config, ADMIN_USER_ID, TELEGRAM_CHAT_ID, TELEGRAM_BOT_TOKEN
+from notifier import TelegramNotifier, FanoutDispatcher
+from subscriptions import SubscriptionStore
+from capture import TrafficRecorder
+from profiler import SamplingProfiler, MAX_PROFILE_SECONDS
+from parse_pool import ParsePool, check_stock_html
+from pipeline import RestockPipeline
+from proxy_pool import ProxyPool
+from snapshot_api import SnapshotStore
 
 # 常量定义
 STATUS_FILE = "stock_status.json"
 PRODUCTS_FILE = "products.json"
 
 class TobaccoWatcher:
-    def __init__(self):
+    def __init__(self, session=None, replay=False):
+        """
+        :param session: 可注入的 HTTP 会话 (回放模式使用 ReplaySession)
+        :param replay: 回放模式，只用于离线调用 _scan_site：不读写状态文件、不发送消息、
+                       不启动代理池/采集/订阅推送/事件管线/查询 API 等后台组件
+        """
+        self.replay = replay
+
         # 1. 初始化网络与工具
-        self.session = self._init_session()
+        self.session = session or self._init_session()
+        self.proxy_pool = None if replay else ProxyPool.from_file(self._init_session) # 出口代理池 (未配置时为 None，直连)
+        self.recorder = None if replay else TrafficRecorder.from_config() # 流量采集 (未开启时为 None)
+        self.request_jitter = None if replay else (0.1, 0.5) # 请求前随机延迟区间，None 表示不延迟
+        self.parse_pool = ParsePool() # HTML 解析进程池 (PARSE_WORKERS=0 时线程内解析)
+        self.card_fingerprints = {} # url -> {卡片指纹: product_id}，用于跳过未变化的卡片
+        self.card_stats = {'cards': 0, 'skipped': 0} # 本轮卡片指纹命中统计
         self.ua = UserAgent()
-        self.notifier = TelegramNotifier(self.session)
+        self.notifier = TelegramNotifier(self.session, token=None if replay else TELEGRAM_BOT_TOKEN)
+        self.dispatcher = None if replay else FanoutDispatcher(self.notifier) # 订阅者批量推送
+        self.subscriptions = None if replay else SubscriptionStore()
         self.lock = threading.RLock() # 线程安全锁 (改为 RLock 以支持重入)
+        self.dashboard_lock = threading.Lock() # 看板刷新专用锁，避免 Telegram 调用期间阻塞扫描线程
         
-        # 2. 加载持久化数据
-        self.history_file_exists = os.path.exists(STATUS_FILE)
-        self.watch_list = self._load_products()
-        self.stock_history = self._load_history()
+        # 2. 加载持久化数据 (回放模式从空状态开始)
+        self.history_file_exists = False if replay else os.path.exists(STATUS_FILE)
+        self.watch_list = [] if replay else self._load_products()
+        self.stock_history = {} if replay else self._load_history()
         
         # 看板状态 (需在 cleanup 前初始化)
         self.dashboard_message_ids = self.stock_history.get('_dashboard_ids', [])
         self.alert_messages = self.stock_history.get('_alert_messages', {})
+        self.subscriber_alerts = self.stock_history.get('_subscriber_alerts', {}) # pid -> [[chat_id, message_id]]
+        # 持续有货计数 pid -> 次数 (仅有货商品)，独立于记录保存，未变化卡片计数时无需重建记录
+        self.in_stock_counters = self.stock_history.get('_in_stock_counters')
+        if self.in_stock_counters is None:
+            # 兼容旧状态文件：计数保存在各记录的 in_stock_counter 字段中
+            self.in_stock_counters = {
+                pid: record.get('in_stock_counter', 0) for pid, record in self.stock_history.items()
+                if not pid.startswith('_') and not record.get('is_sold_out', True)
+            }
+
+        # 对外只读查询 API (未配置端口时为 None)，需在 cleanup 保存前初始化
+        self.snapshots = None if replay else SnapshotStore.from_config()
 
         # 3. 清理僵尸数据 (逻辑内存泄漏修复)
-        self._cleanup_stale_data()
+        if not replay:
+            self._cleanup_stale_data()
+            self._publish_snapshot()
 
         # 4. 初始化运行时状态
         self.start_time = datetime.datetime.now()
@@ -51,6 +87,9 @@ class TobaccoWatcher:
         self.error_alert_sent = False
         self.first_run = True
 
+        # 5. 事件管线：每个 URL 扫描完成即推送补货，看板防抖刷新
+        self.pipeline = None if replay else RestockPipeline(self._send_restock_alerts, self._refresh_dashboard)
+
     def _init_session(self):
         s = requests.Session()
         retries = Retry(total=3, backoff_factor=1, status_forcelist=[500, 502, 503, 504])
@@ -100,34 +139,76 @@ class TobaccoWatcher:
                 # 同时尝试清理可能残留的报警 ID
                 if pid in self.alert_messages:
                     del self.alert_messages[pid]
+                self.subscriber_alerts.pop(pid, None)
+                self.in_stock_counters.pop(pid, None)
             
             # 立即保存一次，更新文件
             self.save_history()
 
     def save_history(self):
+        if self.replay: return # 回放模式绝不改写状态文件
+        # 看板 ID 由 _refresh_dashboard 在 dashboard_lock 下修改，先于 self.lock 取副本 (与其加锁顺序一致，避免死锁)
+        with self.dashboard_lock:
+            dashboard_ids = list(self.dashboard_message_ids)
         with self.lock:
             try:
-                self.stock_history['_dashboard_ids'] = self.dashboard_message_ids
+                self.stock_history['_dashboard_ids'] = dashboard_ids
                 self.stock_history['_alert_messages'] = self.alert_messages
+                self.stock_history['_subscriber_alerts'] = self.subscriber_alerts
+                self.stock_history['_in_stock_counters'] = self.in_stock_counters
                 with open(STATUS_FILE, 'w', encoding='utf-8') as f:
                     json.dump(self.stock_history, f, ensure_ascii=False, indent=2)
             except Exception as e:
                 print(f"保存状态失败: {e}")
+        self._publish_snapshot()
+
+    def _publish_snapshot(self):
+        """持久化后发布不可变快照，查询 API 读取快照而不触碰 self.lock"""
+        if not self.snapshots: return
+        with self.lock:
+            # 记录只替换不修改，浅拷贝引用即可
+            records = {k: v for k, v in self.stock_history.items() if not k.startswith('_')}
+        self.snapshots.publish(records)
 
     def fetch_page(self, url):
+        resp = self._fetch_raw(url)
+        return resp.text if resp is not None else None
+
+    def _fetch_raw(self, url):
+        """抓取页面并返回响应对象 (原始字节供解析进程池使用)，失败返回 None"""
         try:
             timestamp = int(time.time() * 1000)
             target = f"{url}{'&' if '?' in url else '?'} _t={timestamp}"
             
             headers = {"User-Agent": self.ua.random}
             
-            resp = self.session.get(target, headers=headers, timeout=10)
+            start = time.perf_counter()
+            resp = self._http_get(target, headers=headers, timeout=10)
+            if self.recorder: self.recorder.record(url, resp, time.perf_counter() - start)
             resp.raise_for_status()
-            return resp.text
+            return resp
         except Exception as e:
             print(f"❌ 请求失败 [{url}]: {e}")
             return None
 
+    def _http_get(self, url, **kwargs):
+        """统一出口：配置了代理池时按域名选择代理并回报健康状态，否则直连"""
+        domain = urlparse(url).netloc
+        proxy = self.proxy_pool.acquire(domain) if self.proxy_pool else None
+        if not proxy:
+            return self.session.get(url, **kwargs)
+
+        start = time.perf_counter()
+        try:
+            resp = proxy.session.get(url, **kwargs)
+        except Exception as e:
+            self.proxy_pool.report(proxy, domain, url, time.perf_counter() - start, error=e,
+                                   headers=kwargs.get('headers'))
+            raise
+        self.proxy_pool.report(proxy, domain, url, time.perf_counter() - start, status=resp.status_code,
+                               headers=kwargs.get('headers'))
+        return resp
+
     def _decrypt_pipeuncle_data(self, encrypted_text):
         """解密茄营 API 数据"""
         try:
@@ -140,6 +221,11 @@ class TobaccoWatcher:
             print(f"解密失败: {e}")
             return None
 
+    def _jitter(self):
+        """请求前随机延迟，降低被封风险"""
+        if self.request_jitter:
+            time.sleep(random.uniform(*self.request_jitter))
+
     def _get_product_id(self, name, url):
         """统一生成商品唯一 ID"""
         return f"{name}_{url}"
@@ -152,6 +238,9 @@ class TobaccoWatcher:
         if pid in self.alert_messages:
             self.notifier.delete_message(self.alert_messages[pid])
             del self.alert_messages[pid]
+        # 订阅者消息交给推送队列异步删除，避免在锁内逐条调用 API
+        for chat_id, message_id in self.subscriber_alerts.pop(pid, []):
+            self.dispatcher.submit_delete(chat_id, message_id)
 
     def _handle_product_update(self, product_id, name, url, site_name, is_sold_out):
         """
@@ -164,7 +253,7 @@ class TobaccoWatcher:
             
             last_record = self.stock_history.get(product_id, {})
             was_sold_out = last_record.get('is_sold_out', True)
-            in_stock_counter = last_record.get('in_stock_counter', 0)
+            in_stock_counter = self.in_stock_counters.get(product_id, 0)
             
             # 状态改变 或 新商品加入，都视为变更，需要刷新看板
             status_changed = (is_sold_out != was_sold_out) or is_new_product
@@ -197,6 +286,11 @@ class TobaccoWatcher:
                             print(f"🗑️ [超时] {name} 持续有货 {in_stock_counter} 次，自动移除通知")
                             self._delete_alert(product_id)
             
+            if is_sold_out:
+                self.in_stock_counters.pop(product_id, None)
+            else:
+                self.in_stock_counters[product_id] = in_stock_counter
+
             # 更新记录
             record = {
                 'name': name,
@@ -204,12 +298,32 @@ class TobaccoWatcher:
                 'is_sold_out': is_sold_out,
                 'site_name': site_name,
                 'updated_at': datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                'in_stock_counter': in_stock_counter
             }
             self.stock_history[product_id] = record
             
             return should_notify, status_changed, record
 
+    def _touch_unchanged_products(self, fingerprints):
+        """
+        未变化卡片的轻量更新：不重建记录，只递增 in_stock_counters 中的持续有货计数 (60 次后自动删除通知)
+        :param fingerprints: {卡片指纹: product_id}
+        :return: 仍然有效的指纹 (记录已不存在的会被剔除，下一轮走完整流程)
+        """
+        valid = {}
+        with self.lock:
+            for fp, product_id in fingerprints.items():
+                record = self.stock_history.get(product_id)
+                if not record: continue
+                valid[fp] = product_id
+                if record['is_sold_out']: continue
+
+                in_stock_counter = self.in_stock_counters.get(product_id, 0) + 1
+                self.in_stock_counters[product_id] = in_stock_counter
+                if in_stock_counter == 60:
+                    print(f"🗑️ [超时] {record['name']} 持续有货 {in_stock_counter} 次，自动移除通知")
+                    self._delete_alert(product_id)
+        return valid
+
     def _process_product_batch(self, site_name, products_iter):
         """
         统一处理一批商品数据的状态更新循环
@@ -236,7 +350,7 @@ class TobaccoWatcher:
     def _scan_api_pipeuncle(self, item):
         """[策略] 茄营 (PipeUncle) API 专用扫描逻辑"""
         # API 模式不需要 sleep，并发控制由 run 方法的线程池处理
-        time.sleep(random.uniform(0.1, 0.5))
+        self._jitter()
         
         api_url = item['url']
         site_name, _ = get_site_config(api_url) # 从 Config 获取统一名称，不再硬编码
@@ -260,7 +374,9 @@ class TobaccoWatcher:
         local_changed = False
         
         try:
-            resp = self.session.get(api_url, headers=headers, timeout=10)
+            start = time.perf_counter()
+            resp = self._http_get(api_url, headers=headers, timeout=10)
+            if self.recorder: self.recorder.record(api_url, resp, time.perf_counter() - start)
             resp.raise_for_status()
             json_resp = resp.json()
             
@@ -298,90 +414,47 @@ class TobaccoWatcher:
             return True, [], False
 
     def _check_stock_html(self, card_soup, selectors):
-        """[工具] 解析 HTML 单商品库存"""
-        name_elem = card_soup.select_one(selectors['product_name'])
-        if not name_elem: return None, True
-        
-        raw_name = name_elem.get_text(strip=True)
-        name = re.sub(r'<[^>]+>', '', raw_name).strip()
-
-        button = card_soup.select_one(selectors['status_button'])
-        if not button: return None, None
-
-        # 获取按钮文本 (预处理)
-        import copy
-        btn_clone = copy.copy(button)
-        for hidden in btn_clone.select('.hidden'): hidden.decompose()
-        btn_text = btn_clone.get_text(strip=True).upper()
-
-        # 策略 0: 正向匹配 (优先) - 如果配置了明确的有货关键词
-        if selectors.get('in_stock_text'):
-            target_text = selectors['in_stock_text'].upper()
-            # 默认设为售罄，只有匹配到有货关键词才算有货
-            is_sold_out = True
-            if target_text in btn_text:
-                is_sold_out = False
-                
-                # [新增] 二次校验：即使文字匹配，如果包含特定售罄 class 也视为无货
-                # (应对 Ribenyan 这种没货也显示"加购物车"但样式为 btn-secondary 的情况)
-                if selectors.get('sold_out_class'):
-                    # class 属性通常是列表，但也可能是字符串，安全处理
-                    btn_classes = button.get('class', [])
-                    if isinstance(btn_classes, str): btn_classes = [btn_classes]
-                    
-                    if selectors['sold_out_class'] in btn_classes:
-                        is_sold_out = True
-
-        # 策略 A: 特定售罄文字 (反向匹配)
-        elif selectors.get('sold_out_text'):
-            is_sold_out = False # 默认有货
-            target_text = selectors['sold_out_text'].upper()
-            if target_text in btn_text:
-                is_sold_out = True
-        
-        # 策略 B: 通用属性 (反向匹配)
-        else:
-            is_sold_out = False # 默认有货
-            if button.has_attr('disabled'): is_sold_out = True
-            if not is_sold_out:
-                classes = button.get('class', [])
-                if any('sold-out' in c for c in classes): is_sold_out = True
-            if not is_sold_out:
-                default_keywords = ["售罄", "SOLD OUT", "SOLDOUT", "OUT OF STOCK"]
-                if any(kw in btn_text for kw in default_keywords):
-                    is_sold_out = True
-
-        return name, is_sold_out
+        """[工具] 解析 HTML 单商品库存 (实现见 parse_pool，以便在子进程中复用)"""
+        return check_stock_html(card_soup, selectors)
 
     def _scan_html_site(self, item):
         """[策略] 通用 HTML 站点扫描逻辑"""
-        time.sleep(random.uniform(0.1, 0.5))
+        self._jitter()
 
         url = item['url']
         site_name, selectors = get_site_config(url)
         
-        html = self.fetch_page(url)
-        if not html:
+        resp = self._fetch_raw(url)
+        if resp is None or not resp.content:
             return True, [], False
 
-        soup = BeautifulSoup(html, 'html.parser')
-        cards = soup.select(selectors['product_card'])
-        
-        found_count = 0
-        def product_generator():
-            nonlocal found_count
-            for card in cards:
-                result = self._check_stock_html(card, selectors)
-                if result and result[0] is not None:
-                    name, is_sold_out = result
-                    found_count += 1
-                    yield name, url, is_sold_out
-
-        local_restocks, local_changed = self._process_product_batch(site_name, product_generator())
+        # BeautifulSoup 构建、select 与库存判断均在解析进程池中完成
+        # 上一轮指纹一并传入，未变化的卡片在解析阶段即被跳过
+        known = self.card_fingerprints.get(url, {})
+        try:
+            products, skipped, card_count = self.parse_pool.parse(
+                resp.content, resp.encoding, selectors, frozenset(known)
+            )
+        except Exception as e:
+            print(f"❌ [{site_name}] 解析失败 [{url}]: {e}")
+            return True, [], False
+
+        local_restocks, local_changed = self._process_product_batch(
+            site_name, ((name, url, is_sold_out) for _, name, is_sold_out in products)
+        )
+
+        # 重建该 URL 的指纹缓存 (下架的卡片自然淘汰)
+        fingerprints = {fp: self._get_product_id(name, url) for fp, name, _ in products}
+        fingerprints.update(self._touch_unchanged_products({fp: known[fp] for fp in skipped}))
+        self.card_fingerprints[url] = fingerprints
+
+        with self.lock:
+            self.card_stats['cards'] += card_count
+            self.card_stats['skipped'] += len(skipped)
         
-        if found_count == 0:
-            if len(cards) > 0:
-                print(f"⚠️ [{site_name}] 警告: 找到了 {len(cards)} 个卡片但无法提取商品信息，请检查内部选择器")
+        if not products and not skipped:
+            if card_count > 0:
+                print(f"⚠️ [{site_name}] 警告: 找到了 {card_count} 个卡片但无法提取商品信息，请检查内部选择器")
             else:
                 print(f"⚠️ [{site_name}] 警告: 未找到任何商品卡片，请检查 product_card 选择器")
                 
@@ -396,35 +469,32 @@ class TobaccoWatcher:
         # 2. 默认策略 (HTML 通用解析)
         return self._scan_html_site(item)
 
+    def _scan_and_publish(self, item):
+        """扫描单个 URL 并立即发布结果事件 (补货推送不再等待同域名的其他页面)"""
+        has_error, restocks, changed = self._scan_site(item)
+        force_refresh = self.first_run and not self.history_file_exists
+        self.pipeline.publish(item['url'], restocks, changed or force_refresh)
+        return has_error, restocks, changed
+
     def _scan_domain_group(self, domain, items):
         """针对特定域名的并行扫描任务"""
         print(f"🚀 [并发] 正在扫描: {domain} ({len(items)} 任务)")
         
-        domain_restocks = []
         domain_error = False
         domain_changed = False
         
         # 每个网站单独的类别并发 10 扫描
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            futures = [executor.submit(self._scan_site, item) for item in items]
+        with ThreadPoolExecutor(max_workers=10, thread_name_prefix=f"scan-{domain}") as executor:
+            futures = [executor.submit(self._scan_and_publish, item) for item in items]
             
             for future in as_completed(futures):
                 try:
-                    has_error, restocks, changed = future.result()
+                    has_error, _, changed = future.result()
                     if has_error: domain_error = True
                     if changed: domain_changed = True
-                    if restocks: domain_restocks.extend(restocks)
                 except Exception as e:
                     print(f"⚠️ {domain} 线程异常: {e}")
                     domain_error = True
-
-        # 即时反馈
-        if domain_changed or (self.first_run and not self.history_file_exists):
-            self._refresh_dashboard()
-            
-        if domain_restocks:
-            print(f"⚡ [即时推送] {domain} 发现 {len(domain_restocks)} 个补货")
-            self._send_restock_alerts(domain_restocks)
             
         return domain_error, domain_changed
 
@@ -433,8 +503,13 @@ class TobaccoWatcher:
         print("-" * 50)
         # [热更新] 每一轮都重新加载商品列表，无需重启程序
         self.watch_list = self._load_products()
-        
+        # 从 products.json 移除的 URL 不再扫描，同步淘汰其卡片指纹缓存
+        watched_urls = {item['url'] for item in self.watch_list}
+        for url in [u for u in self.card_fingerprints if u not in watched_urls]:
+            del self.card_fingerprints[url]
+
         self.last_scan_time = datetime.datetime.now()
+        self.card_stats = {'cards': 0, 'skipped': 0}
         
         # 1. 对监控列表按域名进行分组
         domain_groups = {}
@@ -450,7 +525,7 @@ class TobaccoWatcher:
         print(f"🔄 启动全站并发扫描: {', '.join(domains)}")
 
         # 2. 顶级并发：每个域名一个线程，同时开始
-        with ThreadPoolExecutor(max_workers=len(domains) + 1) as main_executor:
+        with ThreadPoolExecutor(max_workers=len(domains) + 1, thread_name_prefix="domain") as main_executor:
             futures = []
             for domain, items in domain_groups.items():
                 futures.append(main_executor.submit(self._scan_domain_group, domain, items))
@@ -464,12 +539,21 @@ class TobaccoWatcher:
                     print(f"⚠️ 域名扫描总控异常: {e}")
                     any_error = True
 
+        # 等待本轮补货推送完成、看板刷新到最终状态，再持久化
+        self.pipeline.drain()
         self.first_run = False
             
         # 3. 输出统计日志
         total_items = sum(1 for k in self.stock_history if not k.startswith('_'))
         in_stock_count = sum(1 for v in self.stock_history.values() if isinstance(v, dict) and not v.get('is_sold_out', True))
         print(f"📊 本轮统计: 总计 {total_items} 商品 | ✅ 有货: {in_stock_count} | ❌ 售罄: {total_items - in_stock_count}")
+        if self.card_stats['cards']:
+            ratio = self.card_stats['skipped'] * 100 / self.card_stats['cards']
+            print(f"🧩 卡片指纹: 跳过 {self.card_stats['skipped']}/{self.card_stats['cards']} 个未变化卡片 ({ratio:.1f}%)")
+        latency = self.pipeline.latency_summary()
+        if latency: print(latency)
+        if self.proxy_pool: print(self.proxy_pool.summary())
+        if self.recorder: print(self.recorder.summary())
 
         # 4. 持久化与错误处理
         self.save_history()
@@ -478,8 +562,8 @@ class TobaccoWatcher:
 
     def _refresh_dashboard(self):
         """刷新看板消息"""
-        # 加锁防止多线程并发刷新导致消息重复发送
-        with self.lock:
+        # 加锁防止多线程并发刷新导致消息重复发送 (独立于 self.lock，不阻塞扫描线程)
+        with self.dashboard_lock:
             pages = self._generate_dashboard_content()
             
             # 多退
@@ -563,13 +647,30 @@ class TobaccoWatcher:
                 f"📦 <b>{item['name']}</b>\n"
                 f"🔗 <a href='{item['url']}'>点击购买</a>"
             )
+            # 使用统一 ID 生成逻辑
+            pid = self._get_product_id(item['name'], item['url'])
             resp = self.notifier.send_message(text)
             if resp:
-                # 使用统一 ID 生成逻辑
-                pid = self._get_product_id(item['name'], item['url'])
                 with self.lock:
                     self.alert_messages[pid] = resp['result']['message_id']
 
+            # 订阅者分发：倒排索引匹配 + 推送队列批量发送
+            recipients = self.subscriptions.match(item)
+            recipients.discard(str(TELEGRAM_CHAT_ID))
+            if recipients:
+                self.dispatcher.submit(recipients, text, on_sent=self._make_subscriber_alert_recorder(pid))
+
+    def _make_subscriber_alert_recorder(self, pid):
+        """生成订阅消息发送成功后的回调，记录消息 ID 以便售罄时删除"""
+        def record(chat_id, message_id):
+            with self.lock:
+                # 入队期间已售罄，则直接删除刚发出的消息
+                if self.stock_history.get(pid, {}).get('is_sold_out', True):
+                    self.dispatcher.submit_delete(chat_id, message_id)
+                    return
+                self.subscriber_alerts.setdefault(pid, []).append([chat_id, message_id])
+        return record
+
     def _handle_errors(self, has_error):
         if has_error:
             self.consecutive_errors += 1
@@ -595,9 +696,74 @@ class TobaccoWatcher:
             uptime = str(datetime.datetime.now() - self.start_time).split('.')[0]
             msg = (f"🤖 <b>状态报告</b>\n⏱ 运行时长: {uptime}\n"
             f"📉 错误计数: {self.consecutive_errors}")
+            latency = self.pipeline.latency_summary()
+            if latency: msg += f"\n{latency}"
+            self.notifier.send_message(msg, chat_id)
+        elif text.startswith("/profile"):
+            self._handle_profile(text, chat_id)
+        elif text.startswith("/subscribe"):
+            self._handle_subscribe(text, chat_id)
+        elif text.startswith("/unsubscribe"):
+            self._handle_unsubscribe(text, chat_id)
+
+    def _command_arg(self, text):
+        """提取指令参数 (兼容 /cmd@bot 写法)"""
+        parts = text.split(maxsplit=1)
+        return parts[1].strip() if len(parts) > 1 else ""
+
+    def _handle_profile(self, text, chat_id):
+        """管理员指令: /profile [秒数]，对全部线程采样分析"""
+        # 私聊中 chat_id 即用户 ID
+        if not ADMIN_USER_ID or str(chat_id) != str(ADMIN_USER_ID):
+            print(f"⛔ 非管理员尝试 /profile: {chat_id}")
+            return
+        if not SamplingProfiler.reserve():
+            self.notifier.send_message("⏳ 已有性能分析在运行，请稍后", chat_id)
+            return
+
+        arg = self._command_arg(text)
+        seconds = int(arg) if arg.isdigit() else 30
+        seconds = max(1, min(seconds, MAX_PROFILE_SECONDS))
+        print(f"📩 收到 /profile {seconds}s")
+        self.notifier.send_message(f"🔬 开始采样 {seconds} 秒...", chat_id)
+
+        # 在独立线程中采样，避免阻塞指令监听
+        def worker():
+            # 任务已在上方预占，由本线程负责释放
+            summary, path = SamplingProfiler().run(seconds, reserved=True)
+            self.notifier.send_message(f"{summary}\n💾 火焰图数据: <code>{path}</code>", chat_id)
+        threading.Thread(target=worker, name="profiler", daemon=True).start()
+
+    def _handle_subscribe(self, text, chat_id):
+        query = self._command_arg(text)
+        if not query:
+            subs = self.subscriptions.list(chat_id)
+            if not subs:
+                msg = "📭 暂无订阅\n用法: /subscribe 品牌/站点/关键词"
+            else:
+                lines = [f"{'🏪' if s['kind'] == 'site' else '🔎'} {html.escape(s['value'])}" for s in subs]
+                msg = "📋 <b>我的订阅</b>\n" + "\n".join(lines)
             self.notifier.send_message(msg, chat_id)
+            return
+
+        print(f"📩 收到 /subscribe {query}")
+        sub = self.subscriptions.add(chat_id, query)
+        if sub:
+            kind = "站点" if sub['kind'] == 'site' else "关键词"
+            self.notifier.send_message(f"✅ 已订阅{kind}: <b>{html.escape(sub['value'])}</b>", chat_id)
+        else:
+            self.notifier.send_message(f"ℹ️ 订阅无效或已存在: {html.escape(query)}", chat_id)
+
+    def _handle_unsubscribe(self, text, chat_id):
+        query = self._command_arg(text)
+        print(f"📩 收到 /unsubscribe {query}")
+        removed = self.subscriptions.remove(chat_id, query or None)
+        if removed:
+            self.notifier.send_message(f"🗑️ 已取消 {removed} 个订阅", chat_id)
+        else:
+            self.notifier.send_message(f"ℹ️ 未找到订阅: {html.escape(query) or '(全部)'}", chat_id)
 
     def start_bot(self):
         """启动指令监听线程"""
-        t = threading.Thread(target=self.notifier.poll_commands, args=(self.handle_command,), daemon=True)
+        t = threading.Thread(target=self.notifier.poll_commands, args=(self.handle_command,), name="telegram-bot", daemon=True)
         t.start()
\ No newline at end of file